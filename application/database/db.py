@@ -9,7 +9,6 @@ import yaml
 
 from pprint import pprint
 
-from collections import Counter
 from itertools import permutations
 from typing import Any, Dict, List, Optional, Tuple, cast
 from neomodel.exceptions import (
@@ -20,7 +19,7 @@ from neomodel.exceptions import (
 from flask import json as flask_json
 from sqlalchemy.orm import aliased
 from flask_sqlalchemy.model import DefaultMeta
-from sqlalchemy import func, delete
+from sqlalchemy import DDL, event, func, delete, select, union_all
 
 from neomodel import (
     config,
@@ -47,6 +46,11 @@ from application.utils.gap_analysis import (
 
 from .. import sqla  # type: ignore
 
+try:
+    from yaml import CSafeDumper as _SafeDumper
+except ImportError:  # libyaml is not available
+    from yaml import SafeDumper as _SafeDumper  # type: ignore
+
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -54,11 +58,38 @@ logger.setLevel(logging.INFO)
 
 BaseModel: DefaultMeta = sqla.Model
 
+# text_search shortcuts, compiled once instead of on every search
+_CRE_ID_SEARCH = re.compile(r"CRE(:| )(?P<id>\d+-\d+)", re.IGNORECASE)
+_CRE_NAKED_ID_SEARCH = re.compile(r"\d\d\d-\d\d\d", re.IGNORECASE)
+_CRE_NAME_SEARCH = re.compile(r"CRE(:| )(?P<name>\w+)", re.IGNORECASE)
+_NODE_SEARCH = re.compile(
+    r"(Node|(?P<ntype>"
+    + "|".join([v.value for v in cre_defs.Credoctypes])
+    + r"))?((:| )?(?P<link>https?://\S+))?((:| )(?P<val>.+$))?",
+    re.IGNORECASE,
+)
+
 
 def generate_uuid():
     return str(uuid.uuid4())
 
 
+def trigram_index(name: str, expression: str) -> sqla.Index:
+    """a GIN trigram index so that text_search's substring LIKEs can use it,
+    pg_trgm is postgres only so other databases skip it"""
+    return sqla.Index(
+        name, sqla.text(f"{expression} gin_trgm_ops"), postgresql_using="gin"
+    ).ddl_if(dialect="postgresql")
+
+
+# the trigram indexes need the extension to exist before the tables are created
+event.listen(  # type: ignore
+    BaseModel.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),  # type: ignore
+)
+
+
 class Node(BaseModel):  # type: ignore
     __tablename__ = "node"
     id = sqla.Column(sqla.String, primary_key=True, default=generate_uuid)
@@ -92,6 +123,12 @@ class Node(BaseModel):  # type: ignore
             section_id,
             name="uq_node",
         ),
+        trigram_index("ix_node_name_trgm", "lower(name)"),
+        trigram_index("ix_node_section_trgm", "lower(section)"),
+        trigram_index("ix_node_subsection_trgm", "lower(subsection)"),
+        trigram_index("ix_node_section_id_trgm", "lower(section_id)"),
+        trigram_index("ix_node_link_trgm", "link"),
+        trigram_index("ix_node_description_trgm", "description"),
     )
 
 
@@ -99,13 +136,16 @@ class CRE(BaseModel):  # type: ignore
     __tablename__ = "cre"
     id = sqla.Column(sqla.String, primary_key=True, default=generate_uuid)
 
-    external_id = sqla.Column(sqla.String, default="")
+    external_id = sqla.Column(sqla.String, default="", index=True)
     description = sqla.Column(sqla.String, default="")
     name = sqla.Column(sqla.String)
     tags = sqla.Column(sqla.String, default="")  # coma separated tags
 
     __table_args__ = (
         sqla.UniqueConstraint(name, external_id, name="unique_cre_fields"),
+        trigram_index("ix_cre_name_trgm", "lower(name)"),
+        trigram_index("ix_cre_external_id_trgm", "external_id"),
+        trigram_index("ix_cre_description_trgm", "lower(description)"),
     )
 
 
@@ -131,6 +171,8 @@ class InternalLinks(BaseModel):  # type: ignore
             name="uq_pair",
         ),
         sqla.CheckConstraint("type != 'PartOf'", name="No 'PartOf' links"),
+        # the primary key covers lookups by group, this covers lookups by cre
+        sqla.Index("ix_cre_links_cre_group", cre, group),
     )
 
 
@@ -153,6 +195,8 @@ class Links(BaseModel):  # type: ignore
             node,
             name="uq_pair",
         ),
+        # the primary key covers lookups by cre, this covers lookups by node
+        sqla.Index("ix_cre_node_links_node_cre", node, cre),
     )
 
 
@@ -565,31 +609,9 @@ class NEO_DB:
         logger.info(f"Performing GraphDB queries for gap analysis {name_1}>>{name_2}")
         base_standard = NeoStandard.nodes.filter(name=name_1)
         denylist = ["Cross-cutting concerns"]
-        from datetime import datetime
-
-        t1 = datetime.now()
 
-        path_records_all, _ = db.cypher_query(
-            """
-         MATCH (BaseStandard:NeoStandard {name: $name1})
-         MATCH (CompareStandard:NeoStandard {name: $name2})
-         MATCH p = allShortestPaths((BaseStandard)-[*..20]-(CompareStandard))
-         WITH p
-         WHERE length(p) > 1 AND ALL (n in NODES(p) where (n:NeoCRE or n = BaseStandard or n = CompareStandard) AND NOT n.name in $denylist) 
-         RETURN p
-            """,
-            # """
-            # OPTIONAL MATCH (BaseStandard:NeoStandard {name: $name1})
-            # OPTIONAL MATCH (CompareStandard:NeoStandard {name: $name2})
-            # OPTIONAL MATCH p = allShortestPaths((BaseStandard)-[*..20]-(CompareStandard))
-            # WITH p
-            # WHERE length(p) > 1 AND ALL(n in NODES(p) WHERE (n:NeoCRE or n = BaseStandard or n = CompareStandard) AND NOT n.name in $denylist)
-            # RETURN p
-            # """,
-            {"name1": name_1, "name2": name_2, "denylist": denylist},
-            resolve_objects=True,
-        )
-        t2 = datetime.now()
+        # both path flavours in one round-trip, UNION ALL does not keep the
+        # branches in order so every path says which one it came from
         path_records, _ = db.cypher_query(
             """
          MATCH (BaseStandard:NeoStandard {name: $name1})
@@ -597,50 +619,54 @@ class NEO_DB:
          MATCH p = allShortestPaths((BaseStandard)-[:(LINKED_TO|AUTOMATICALLY_LINKED_TO|CONTAINS)*..20]-(CompareStandard))
          WITH p
          WHERE length(p) > 1 AND ALL(n in NODES(p) WHERE (n:NeoCRE or n = BaseStandard or n = CompareStandard) AND NOT n.name in $denylist)
-         RETURN p
+         RETURN p, 0 AS kind
+         UNION ALL
+         MATCH (BaseStandard:NeoStandard {name: $name1})
+         MATCH (CompareStandard:NeoStandard {name: $name2})
+         MATCH p = allShortestPaths((BaseStandard)-[*..20]-(CompareStandard))
+         WITH p
+         WHERE length(p) > 1 AND ALL (n in NODES(p) where (n:NeoCRE or n = BaseStandard or n = CompareStandard) AND NOT n.name in $denylist)
+         RETURN p, 1 AS kind
             """,
-            # """
-            # OPTIONAL MATCH (BaseStandard:NeoStandard {name: $name1})
-            # OPTIONAL MATCH (CompareStandard:NeoStandard {name: $name2})
-            # OPTIONAL MATCH p = allShortestPaths((BaseStandard)-[:(LINKED_TO|AUTOMATICALLY_LINKED_TO|CONTAINS)*..20]-(CompareStandard))
-            # WITH p
-            # WHERE length(p) > 1 AND ALL(n in NODES(p) WHERE (n:NeoCRE or n = BaseStandard or n = CompareStandard) AND NOT n.name in $denylist)
-            # RETURN p
-            # """,
             {"name1": name_1, "name2": name_2, "denylist": denylist},
             resolve_objects=True,
         )
-        t3 = datetime.now()
-
-        def format_segment(seg: StructuredRel, nodes):
-            relation_map = {
-                RelatedRel: "RELATED",
-                ContainsRel: "CONTAINS",
-                LinkedToRel: "LINKED_TO",
-                AutoLinkedToRel: "AUTOMATICALLY_LINKED_TO",
-            }
-            start_node = [
-                node for node in nodes if node.element_id == seg._start_node_element_id
-            ][0]
-            end_node = [
-                node for node in nodes if node.element_id == seg._end_node_element_id
-            ][0]
-
+        # the strong paths first, then all paths
+        path_records = sorted(path_records, key=lambda rec: rec[1])
+
+        relation_map = {
+            RelatedRel: "RELATED",
+            ContainsRel: "CONTAINS",
+            LinkedToRel: "LINKED_TO",
+            AutoLinkedToRel: "AUTOMATICALLY_LINKED_TO",
+        }
+        # paths share most of their nodes, parse each of them once
+        parsed_nodes: Dict[str, cre_defs.Document] = {}
+
+        def parse_node(node: NeoDocument) -> cre_defs.Document:
+            if node.element_id not in parsed_nodes:
+                parsed_nodes[node.element_id] = NEO_DB.parse_node_no_links(node)
+            return parsed_nodes[node.element_id]
+
+        def format_segment(
+            seg: StructuredRel, nodes: Dict[str, NeoDocument]
+        ) -> Dict[str, Any]:
             return {
-                "start": NEO_DB.parse_node_no_links(start_node),
-                "end": NEO_DB.parse_node_no_links(end_node),
+                "start": parse_node(nodes[seg._start_node_element_id]),
+                "end": parse_node(nodes[seg._end_node_element_id]),
                 "relationship": relation_map[type(seg)],
             }
 
         def format_path_record(rec):
+            nodes = {node.element_id: node for node in rec.nodes}
             return {
-                "start": NEO_DB.parse_node_no_links(rec.start_node),
-                "end": NEO_DB.parse_node_no_links(rec.end_node),
-                "path": [format_segment(seg, rec.nodes) for seg in rec.relationships],
+                "start": parse_node(rec.start_node),
+                "end": parse_node(rec.end_node),
+                "path": [format_segment(seg, nodes) for seg in rec.relationships],
             }
 
         return [NEO_DB.parse_node_no_links(rec) for rec in base_standard], [
-            format_path_record(rec[0]) for rec in (path_records + path_records_all)
+            format_path_record(rec[0]) for rec in path_records
         ]
 
     @classmethod
@@ -758,47 +784,57 @@ class Node_collection:
     def object_select(cls, node: Node, skip_attributes: List = []) -> List[Node]:
         if not node:
             return []
-        qu = Node.query.filter()
-
-        for vk, v in vars(node).items():
-            if vk not in skip_attributes and hasattr(Node, vk):
-                if v:
-                    attr = getattr(Node, vk)
-                    qu = qu.filter(attr == v)
-            else:
-                logger.debug(f"{vk} not in Node")
-        return qu.all()
+        return Node.query.filter(
+            *[
+                getattr(Node, k) == v
+                for k, v in node_identity(node, skip_attributes).items()
+            ]
+        ).all()
 
     def get_node_names(
         self, ntype: str = cre_defs.Standard.__name__
     ) -> List[Tuple[str, str]]:
-        q = self.session.query(Node.ntype, Node.name).distinct().all()
+        q = (
+            self.session.query(Node.ntype, Node.name)
+            .distinct()
+            .order_by(Node.ntype, Node.name)
+            .all()
+        )
         if q:
             return [i for i in q]
         return []
 
     def get_max_internal_connections(self) -> int:
-        q = self.session.query(InternalLinks).all()
-        grp_count = Counter([x.group for x in q]) or {0: 0}
-        cre_count = Counter([x.cre for x in q]) or {0: 0}
-        return max([max(cre_count.values()), max(grp_count.values())])
+        links = cast(sqla.Table, InternalLinks.__table__)
+        connections = union_all(
+            select(func.count().label("connections"))
+            .select_from(links)
+            .group_by(InternalLinks.group),
+            select(func.count().label("connections"))
+            .select_from(links)
+            .group_by(InternalLinks.cre),
+        ).alias()
+        return self.session.query(func.max(connections.c.connections)).scalar() or 0
 
     def find_cres_of_cre(self, cre: CRE) -> Optional[List[CRE]]:
         """returns the higher level CREs of the cre or none
         if no higher level cres link to it"""
-        cre_id = self.session.query(CRE.id).filter(CRE.name == cre.name).first()
-        links = (
-            self.session.query(InternalLinks).filter(InternalLinks.cre == cre_id).all()
+        cre_id = cre.id
+        if not cre_id:
+            cre_id = (
+                self.session.query(CRE.id)
+                .filter(CRE.name == cre.name)
+                .limit(1)
+                .scalar_subquery()
+            )
+        result: List[CRE] = (
+            self.session.query(CRE)
+            .join(InternalLinks, InternalLinks.group == CRE.id)
+            .filter(InternalLinks.cre == cre_id)
+            .distinct()
+            .all()
         )
-        if links:
-            result = []
-            for link in links:
-                result.append(
-                    self.session.query(CRE).filter(CRE.id == link.group).first()
-                )
-            return result
-
-        return None
+        return result or None
 
     def find_cres_of_node(self, node: cre_defs.Node) -> Optional[List[CRE]]:
         """returns the CREs that link to this node or none
@@ -829,9 +865,12 @@ class Node_collection:
         if not node:
             return None
 
-        result: List[CRE] = []
-        for link in self.session.query(Links).filter(Links.node == node.id).all():
-            result.append(self.session.query(CRE).filter(CRE.id == link.cre).first())
+        result: List[CRE] = (
+            self.session.query(CRE)
+            .join(Links, Links.cre == CRE.id)
+            .filter(Links.node == node.id)
+            .all()
+        )
         return result or None
 
     def get_by_tags(self, tags: List[str]) -> List[cre_defs.Document]:
@@ -843,8 +882,10 @@ class Node_collection:
         #  and it gets paginated
         nodes_where_clause = []
         cre_where_clause = []
-        documents = []
+        documents: List[cre_defs.Document] = []
 
+        # an empty tag would match everything and a repeated one adds nothing
+        tags = list(dict.fromkeys(tag for tag in tags if tag))
         if not tags:
             return []
 
@@ -852,31 +893,22 @@ class Node_collection:
             nodes_where_clause.append(sqla.and_(Node.tags.like("%{}%".format(tag))))
             cre_where_clause.append(sqla.and_(CRE.tags.like("%{}%".format(tag))))
 
-        nodes = Node.query.filter(*nodes_where_clause).all() or []
-        for node in nodes:
-            node = self.get_nodes(
-                name=node.name,
-                section=node.section,
-                subsection=node.subsection,
-                version=node.version,
-                link=node.link,
-                ntype=node.ntype,
-                sectionID=node.section_id,
-            )
+        # only the ids are needed, the documents are built by primary key below
+        node_ids = self.session.query(Node.id).filter(*nodes_where_clause).all()
+        for (node_id,) in node_ids:
+            node = self.get_nodes(db_id=node_id)
             if node:
                 documents.extend(node)
             else:
                 logger.fatal(
-                    "db.get_node returned None for"
-                    "Node %s:%s:%s that exists, BUG!"
-                    % (node.name, node.section, node.section_id)
+                    "db.get_node returned None for Node %s that exists, BUG!" % node_id
                 )
 
-        cres = CRE.query.filter(*cre_where_clause).all() or []
+        cres = self.session.query(CRE.id, CRE.name).filter(*cre_where_clause).all()
         for c in cres:
-            cre = self.get_CREs(external_id=c.external_id, name=c.name)[0]
+            cre = self.get_CREs(internal_id=c.id)
             if cre:
-                documents.append(cre)
+                documents.extend(cre)
             else:
                 logger.fatal(
                     "db.get_CRE returned None for CRE %s:%s that exists, BUG!"
@@ -1160,65 +1192,78 @@ class Node_collection:
 
     def __make_cre_internal_links(self, cre: CRE) -> List[cre_defs.Link]:
         links = []
-        internal_links = (
-            self.session.query(InternalLinks)
-            .filter(
-                sqla.or_(InternalLinks.cre == cre.id, InternalLinks.group == cre.id)
-            )
+        # relationship types are always "higher"->"lower", fetch the linked cre
+        # of each side in one query
+        higher_cres = (
+            self.session.query(InternalLinks.type, CRE)
+            .join(CRE, CRE.id == InternalLinks.group)
+            .filter(InternalLinks.cre == cre.id)
+            .all()
+        )
+        lower_cres = (
+            self.session.query(InternalLinks.type, CRE)
+            .join(CRE, CRE.id == InternalLinks.cre)
+            .filter(InternalLinks.group == cre.id)
             .all()
         )
 
-        if len(internal_links) == 0:
+        if not higher_cres and not lower_cres:
             logger.debug(
                 f"CRE {cre.name}:{cre.external_id}:{cre.id} has no internal links"
             )
 
-        for internal_link in internal_links:
-
-            linked_cre_query = self.session.query(CRE)
-            link_type = cre_defs.LinkTypes.from_str(internal_link.type)
-
-            if internal_link.cre == cre.id:
-                # if we are the lower cre in this relationship, we need to flip the "Contains" linktypes
-                linked_cre = linked_cre_query.filter(
-                    CRE.id == internal_link.group
-                ).first()  # get the higher cre so we can add the link
-                if link_type == cre_defs.LinkTypes.Contains:
-                    links.append(
-                        cre_defs.Link(
-                            ltype=cre_defs.LinkTypes.PartOf,
-                            document=CREfromDB(linked_cre),
-                        )
-                    )
-                elif (
-                    link_type == cre_defs.LinkTypes.Related
-                ):  # if it's not a "Contains" link, it's a "Related" link
-                    links.append(
-                        cre_defs.Link(ltype=link_type, document=CREfromDB(linked_cre))
+        for ltype, linked_cre in higher_cres:
+            link_type = cre_defs.LinkTypes.from_str(ltype)
+            # if we are the lower cre in this relationship, we need to flip the "Contains" linktypes
+            if link_type == cre_defs.LinkTypes.Contains:
+                links.append(
+                    cre_defs.Link(
+                        ltype=cre_defs.LinkTypes.PartOf,
+                        document=CREfromDB(linked_cre),
                     )
-                continue
-            # if we are are the higher cre then we don't need to do anything, relationship types are always "higher"->"lower"
-            linked_cre = linked_cre_query.filter(CRE.id == internal_link.cre).first()
-            links.append(cre_defs.Link(ltype=link_type, document=CREfromDB(linked_cre)))
+                )
+            elif (
+                link_type == cre_defs.LinkTypes.Related
+            ):  # if it's not a "Contains" link, it's a "Related" link
+                links.append(
+                    cre_defs.Link(ltype=link_type, document=CREfromDB(linked_cre))
+                )
+
+        # if we are are the higher cre then we don't need to do anything
+        for ltype, linked_cre in lower_cres:
+            links.append(
+                cre_defs.Link(
+                    ltype=cre_defs.LinkTypes.from_str(ltype),
+                    document=CREfromDB(linked_cre),
+                )
+            )
         return links
 
     def __make_cre_links(
         self, cre: CRE, include_only_nodes: List[str]
     ) -> List[cre_defs.Link]:
-        links = []
-        for link in self.session.query(Links).filter(Links.cre == cre.id).all():
-            node = self.session.query(Node).filter(Node.id == link.node).first()
-            if node and (not include_only_nodes or node.name in include_only_nodes):
-                links.append(
-                    cre_defs.Link(
-                        ltype=cre_defs.LinkTypes.from_str(link.type),
-                        document=nodeFromDB(node),
-                    )
-                )
-        return links
+        query = (
+            self.session.query(Links.type, Node)
+            .join(Node, Node.id == Links.node)
+            .filter(Links.cre == cre.id)
+        )
+        if include_only_nodes:
+            query = query.filter(Node.name.in_(include_only_nodes))
+        return [
+            cre_defs.Link(
+                ltype=cre_defs.LinkTypes.from_str(ltype),
+                document=nodeFromDB(node),
+            )
+            for ltype, node in query.all()
+        ]
 
-    def export(self, dir: str = None, dry_run: bool = False) -> List[cre_defs.Document]:
-        """Exports the database to a CRE file collection on disk"""
+    def export(
+        self, dir: str = None, dry_run: bool = False, format: str = "yaml"
+    ) -> List[cre_defs.Document]:
+        """Exports the database to a CRE file collection on disk,
+        one file per document in either "yaml" or "json" format"""
+        if format not in ("yaml", "json"):
+            raise ValueError(f"unknown export format {format}")
         docs: Dict[str, cre_defs.Document] = {}
         cre, standard = None, None
 
@@ -1285,7 +1330,7 @@ class Node_collection:
                         .replace(" ", "_")
                         .replace('"', "")
                         .replace("'", "")
-                        + ".yaml"
+                        + f".{format}"
                     )
                 elif hasattr(doc, "sectionID"):
                     title = (
@@ -1295,17 +1340,17 @@ class Node_collection:
                         .replace(" ", "_")
                         .replace('"', "")
                         .replace("'", "")
-                        + ".yaml"
+                        + f".{format}"
                     )
                 else:
                     logger.fatal(
                         f"doc does not have neither sectionID nor id, this is a bug! {doc.__dict__}"
                     )
-                file.writeToDisk(
-                    file_title=title,
-                    file_content=yaml.safe_dump(doc.todict()),
-                    cres_loc=dir,
-                )
+                if format == "json":
+                    content = flask_json.dumps(doc.todict())
+                else:
+                    content = yaml.dump(doc.todict(), Dumper=_SafeDumper)
+                file.writeToDisk(file_title=title, file_content=content, cres_loc=dir)
 
         return list(docs.values())
 
@@ -1412,76 +1457,155 @@ class Node_collection:
         return res
 
     def add_cre(self, cre: cre_defs.CRE) -> CRE:
-        entry: CRE = None
-        query = self.session.query(CRE).filter(func.lower(CRE.name) == cre.name.lower())
-        if cre.id:
-            entry = query.filter(CRE.external_id == cre.id).first()
-        else:
-            entry = query.filter(
-                func.lower(CRE.description) == cre.description.lower()
-            ).first()
+        return self.add_cres([cre])[0]
+
+    def add_node(
+        self, node: cre_defs.Node, comparison_skip_attributes: List = ["link"]
+    ) -> Optional[Node]:
+        return self.add_nodes(
+            [node], comparison_skip_attributes=comparison_skip_attributes
+        )[0]
+
+    def add_cres(self, cres: List[cre_defs.CRE]) -> List[CRE]:
+        """adds the cres that are not known yet and fills in missing fields of the
+        ones that are, all of them are looked up in one query and stored in one commit
+        a cre is known if its name matches case insensitively and either its
+        external id matches or, for cres without an id, its description does"""
+        candidates = (
+            self.session.query(CRE)
+            .filter(func.lower(CRE.name).in_({cre.name.lower() for cre in cres}))
+            .all()
+        )
+
+        def matches(candidate: CRE, cre: cre_defs.CRE) -> bool:
+            if candidate.name.lower() != cre.name.lower():
+                return False
+            if cre.id:
+                return bool(candidate.external_id == cre.id)
+            return bool(
+                candidate.description is not None
+                and candidate.description.lower() == cre.description.lower()
+            )
 
-        if entry is not None:
+        # resolve and check every cre before touching the session,
+        # so an error halfway through the batch leaves nothing behind
+        entries: List[Tuple[CRE, bool]] = []
+        for cre in cres:
+            entry = next((c for c in candidates if matches(c, cre)), None)
+            if entry is None:
+                entry = CRE(
+                    description=cre.description,
+                    name=cre.name,
+                    external_id=cre.id,
+                    tags=",".join([str(t) for t in cre.tags]),
+                )
+                # later duplicates in the same batch match the new entry
+                candidates.append(entry)
+                entries.append((entry, True))
+                continue
+            if not entry.external_id and entry.external_id != cre.id:
+                raise ValueError(
+                    f"Attempting to register existing CRE"
+                    f"{entry.external_id}:{entry.name} with other ID {cre.id}"
+                )
+            entries.append((entry, False))
+
+        for cre, (entry, new) in zip(cres, entries):
+            if new:
+                logger.info("did not know of cre %s ,adding" % cre.name)
+                self.session.add(entry)
+                continue
             logger.info(f"knew of CRE {cre.name} ,updating")
             if not entry.external_id:
-                if entry.external_id != cre.id:
-                    raise ValueError(
-                        f"Attempting to register existing CRE"
-                        f"{entry.external_id}:{entry.name} with other ID {cre.id}"
-                    )
                 entry.external_id = cre.id
             if not entry.description:
                 entry.description = cre.description
             if not entry.tags:
                 entry.tags = ",".join(cre.tags)
-            return entry
-        else:
-            logger.info("did not know of cre %s ,adding" % cre.name)
-            entry = CRE(
-                description=cre.description,
-                name=cre.name,
-                external_id=cre.id,
-                tags=",".join([str(t) for t in cre.tags]),
-            )
-            self.session.add(entry)
-            self.session.commit()
-            if self.graph:
-                self.graph.add_cre(cre=cre)
-        return entry
 
-    def add_node(
-        self, node: cre_defs.Node, comparison_skip_attributes: List = ["link"]
-    ) -> Optional[Node]:
-        if not node:
-            raise ValueError(f"Node is None")
-            return None
-        dbnode = dbNodeFromNode(node)
-        if not dbnode:
-            logger.warning(f"{node} could not be transformed to a DB object")
-            return None
-        if not dbnode.ntype:
-            logger.warning(f"{node} has no registered type, cannot add, skipping")
-            return None
-        entries = self.object_select(dbnode, skip_attributes=comparison_skip_attributes)
-        if entries:
-            entry = entries[0]
-            logger.info(
-                f"knew of node {entry.name}:{entry.section_id}:{entry.section}:{entry.link} ,updating"
-            )
-            if node.section and node.section != entry.section:
-                entry.section = node.section
-            entry.link = node.hyperlink
-            self.session.commit()
-            return entry
-        else:
-            logger.info(
-                f"did not know of node {dbnode.name}:{dbnode.section}:{dbnode.section_id} ,adding"
+        self.session.commit()
+        if self.graph:
+            for cre, (_, new) in zip(cres, entries):
+                if new:
+                    self.graph.add_cre(cre=cre)
+        return [entry for entry, _ in entries]
+
+    def add_nodes(
+        self,
+        nodes: List[cre_defs.Node],
+        comparison_skip_attributes: List[str] = ["link"],
+    ) -> List[Optional[Node]]:
+        """adds the nodes that are not known yet and updates section and link of the
+        ones that are, all of them are looked up in one query and stored in one commit
+        a node is known if every attribute it sets, other than
+        comparison_skip_attributes, matches"""
+        dbnodes: List[Tuple[cre_defs.Node, Optional[Node]]] = []
+        for node in nodes:
+            if not node:
+                raise ValueError(f"Node is None")
+            dbnode = dbNodeFromNode(node)
+            if not dbnode:
+                logger.warning(f"{node} could not be transformed to a DB object")
+            elif not dbnode.ntype:
+                logger.warning(f"{node} has no registered type, cannot add, skipping")
+                dbnode = None
+            dbnodes.append((node, dbnode))
+
+        identities = [
+            node_identity(dbnode, comparison_skip_attributes)
+            for _, dbnode in dbnodes
+            if dbnode
+        ]
+        # only the rows matching one of the nodes on all of its attributes,
+        # a few nodes per query to keep the expression within sqlite's depth limit
+        candidates: List[Node] = []
+        for start in range(0, len(identities), 100):
+            candidates.extend(
+                self.session.query(Node).filter(
+                    sqla.or_(
+                        *[
+                            sqla.and_(
+                                *[getattr(Node, k) == v for k, v in identity.items()]
+                            )
+                            for identity in identities[start : start + 100]
+                        ]
+                    )
+                )
             )
-            self.session.add(dbnode)
-            self.session.commit()
-            if self.graph:
+
+        def matches(candidate: Node, identity: Dict[str, Any]) -> bool:
+            return all(getattr(candidate, k) == v for k, v in identity.items())
+
+        entries: List[Optional[Node]] = []
+        added: List[cre_defs.Node] = []
+        for node, dbnode in dbnodes:
+            if not dbnode:
+                entries.append(None)
+                continue
+            identity = node_identity(dbnode, comparison_skip_attributes)
+            entry = next((c for c in candidates if matches(c, identity)), None)
+            if entry is not None:
+                logger.info(
+                    f"knew of node {entry.name}:{entry.section_id}:{entry.section}:{entry.link} ,updating"
+                )
+                if node.section and node.section != entry.section:
+                    entry.section = node.section
+                entry.link = node.hyperlink
+            else:
+                logger.info(
+                    f"did not know of node {dbnode.name}:{dbnode.section}:{dbnode.section_id} ,adding"
+                )
+                self.session.add(dbnode)
+                candidates.append(dbnode)
+                added.append(node)
+                entry = dbnode
+            entries.append(entry)
+
+        self.session.commit()
+        if self.graph:
+            for node in added:
                 self.graph.add_dbnode(dbnode=node)
-        return dbnode
+        return entries
 
     def add_internal_link(
         self,
@@ -1671,7 +1795,7 @@ class Node_collection:
         return list(set([s[0] for s in standards]))
 
     def text_search(self, text: str) -> List[Optional[cre_defs.Document]]:
-        """Given a piece of text, tries to find the best match
+        r"""Given a piece of text, tries to find the best match
         for the text in the database.
         Shortcuts:
            'CRE:<id>' will search for the <id> in cre external ids
@@ -1683,28 +1807,19 @@ class Node_collection:
            Anything else will be a case insensitive LIKE query in the database
         """
         # structured text search first
-        cre_id_search = r"CRE(:| )(?P<id>\d+-\d+)"
-        cre_naked_id_search = r"\d\d\d-\d\d\d"
-        cre_name_search = r"CRE(:| )(?P<name>\w+)"
-        types = "|".join([v.value for v in cre_defs.Credoctypes])
-        node_search = (
-            r"(Node|(?P<ntype>"
-            + types
-            + "))?((:| )?(?P<link>https?://\S+))?((:| )(?P<val>.+$))?"
-        )
-        match = re.search(cre_id_search, text, re.IGNORECASE)
+        match = _CRE_ID_SEARCH.search(text)
         if match:
             return self.get_CREs(external_id=match.group("id"))
 
-        match = re.search(cre_naked_id_search, text, re.IGNORECASE)
+        match = _CRE_NAKED_ID_SEARCH.search(text)
         if match:
             return self.get_CREs(external_id=match.group())
 
-        match = re.search(cre_name_search, text, re.IGNORECASE)
+        match = _CRE_NAME_SEARCH.search(text)
         if match:
             return self.get_CREs(name=match.group("name"))
 
-        match = re.search(node_search, text, re.IGNORECASE)
+        match = _NODE_SEARCH.search(text)
         if match:
             link = match.group("link")
             ntype = match.group("ntype")
@@ -1732,33 +1847,34 @@ class Node_collection:
                     results.extend(nodes)
             if results:
                 return list(set(results))
-        # fuzzy matches second
-        args = [f"%{text}%", "", "", "", "", ""]
+        # fuzzy matches second, one scan per table matching the text in any column
+        pattern = f"%{text}%"
         results = {}
-        s = set([p for p in permutations(args, 6)])
-        for combo in s:
-            nodes = self.get_nodes(
-                name=combo[0],
-                section=combo[1],
-                subsection=combo[2],
-                link=combo[3],
-                description=combo[4],
-                partial=True,
-                ntype=None,  # type: ignore
-                sectionID=combo[5],
+        node_ids = self.session.query(Node.id).filter(
+            sqla.or_(
+                func.lower(Node.name).like(pattern.lower()),
+                func.lower(Node.section).like(pattern.lower()),
+                func.lower(Node.subsection).like(pattern.lower()),
+                Node.link.like(pattern),
+                Node.description.like(pattern),
+                func.lower(Node.section_id).like(pattern.lower()),
             )
-            if nodes:
-                for node in nodes:
-                    node_key = f"{node.name}:{node.version}:{node.section}:{node.sectionID}:{node.subsection}:"
-                    results[node_key] = node
-        args = [f"%{text}%", None, None]
-        for combo in permutations(args, 3):
-            cres = self.get_CREs(
-                name=combo[0], external_id=combo[1], description=combo[2], partial=True
+        )
+        for (node_id,) in node_ids.all():
+            for node in self.get_nodes(db_id=node_id):
+                node_key = f"{node.name}:{node.version}:{node.section}:{node.sectionID}:{node.subsection}:"
+                results[node_key] = node
+
+        cre_ids = self.session.query(CRE.id).filter(
+            sqla.or_(
+                func.lower(CRE.name).like(pattern.lower()),
+                CRE.external_id.like(pattern),
+                func.lower(CRE.description).like(pattern.lower()),
             )
-            if cres:
-                for cre in cres:
-                    results[cre.id] = cre
+        )
+        for (cre_id,) in cre_ids.all():
+            for cre in self.get_CREs(internal_id=cre_id):
+                results[cre.id] = cre
         return list(results.values())
 
     def get_root_cres(self):
@@ -1910,13 +2026,38 @@ class Node_collection:
         logger.info(f"did not find gap analysis with cache key: {cache_key}")
 
     def add_gap_analysis_result(self, cache_key: str, ga_object: str):
-        if not self.gap_analysis_exists(cache_key):
-            logger.info(f"adding gap analysis result with cache key: {cache_key}")
-            res = GapAnalysisResults(cache_key=cache_key, ga_object=ga_object)
-            self.session.add(res)
+        self.add_gap_analysis_results({cache_key: ga_object})
+
+    def add_gap_analysis_results(self, results: Dict[str, str]):
+        """stores the gap analysis results keyed by cache key in a single commit,
+        results that are already cached are left as they are"""
+        existing = {
+            key
+            for (key,) in self.session.query(GapAnalysisResults.cache_key).filter(
+                GapAnalysisResults.cache_key.in_(results.keys())
+            )
+        }
+        new_results = [
+            GapAnalysisResults(cache_key=cache_key, ga_object=ga_object)
+            for cache_key, ga_object in results.items()
+            if cache_key not in existing
+        ]
+        if new_results:
+            logger.info(f"adding {len(new_results)} gap analysis results")
+            self.session.add_all(new_results)
             self.session.commit()
 
 
+def node_identity(node: Node, skip_attributes: List[str] = []) -> Dict[str, Any]:
+    """the attributes a node is matched on when looking for it in the database,
+    every column it sets other than skip_attributes"""
+    return {
+        vk: v
+        for vk, v in vars(node).items()
+        if vk not in skip_attributes and hasattr(Node, vk) and v
+    }
+
+
 def dbNodeFromNode(doc: cre_defs.Node) -> Optional[Node]:
     if doc.doctype == cre_defs.Credoctypes.Standard:
         return dbNodeFromStandard(doc)
@@ -2103,14 +2244,11 @@ def gap_analysis(
     if cache_key == "":
         cache_key = make_resources_key(node_names)
     logger.info(f"got gap analysis paths for {'>>>'.join(node_names)}, storing result")
-    cre_db.add_gap_analysis_result(
-        cache_key=cache_key, ga_object=flask_json.dumps({"result": grouped_paths})
-    )
-
+    results = {cache_key: flask_json.dumps({"result": grouped_paths})}
     for key in extra_paths_dict:
-        cre_db.add_gap_analysis_result(
-            cache_key=make_subresources_key(node_names, key),
-            ga_object=flask_json.dumps({"result": extra_paths_dict[key]}),
+        results[make_subresources_key(node_names, key)] = flask_json.dumps(
+            {"result": extra_paths_dict[key]}
         )
+    cre_db.add_gap_analysis_results(results)
     logger.info(f"stored gapa analysis for {'>>>'.join(node_names)}, successfully")
     return (node_names, grouped_paths, extra_paths_dict)
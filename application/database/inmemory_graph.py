@@ -1,7 +1,7 @@
 import sys
 import logging
 import networkx as nx
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from application.defs import cre_defs as defs
 
 
@@ -39,31 +39,36 @@ class CRE_Graph:
         self.__graph = graph
         if not len(graph.edges):
             self.__load_cre_graph(graph_data)
+        elif "existing_cycle" in graph.graph:
+            return  # already loaded and checked
+
+        # the graph as a whole is only checked for cycles when it is loaded,
+        # after that every new link is checked for the cycle it would close
+        graph.graph["existing_cycle"] = self.has_cycle()
 
     def introduces_cycle(self, doc_from: defs.Document, link_to: defs.Link):
-        try:
-            ex = self.has_cycle()
-            if ex:
-                raise ValueError(
-                    "Existing graph contains cycle,"
-                    "this not a recoverable error,"
-                    f" manual database actions are required {ex}"
-                )
-        except nx.exception.NetworkXNoCycle:
-            pass  # happy path, we don't want cycles
+        ex = self.__graph.graph.get("existing_cycle")
+        if ex:
+            raise ValueError(
+                "Existing graph contains cycle,"
+                "this not a recoverable error,"
+                f" manual database actions are required {ex}"
+            )
 
-        # TODO: when this becomes too slow (e.g. when we are importing 1000s of CREs at once)
-        # we can instead add the edge find the cycle and then remove the edge
-        new_graph = self.__graph.copy()
+        edge = self.__graph_edge(doc_from=doc_from, link_to=link_to)
+        if not edge:
+            return None
+        source, target, _ = edge
+        if source not in self.__graph or target not in self.__graph:
+            return None
 
-        # this needs our special add_edge but with the copied graph
-        new_graph = self.__add_graph_edge(
-            doc_from=doc_from, link_to=link_to, graph=new_graph
-        )
+        # the new edge closes a cycle only if its target already reaches its source,
+        # this only walks what is reachable from the target instead of copying the graph
         try:
-            return nx.find_cycle(new_graph)
-        except nx.exception.NetworkXNoCycle:
+            path = nx.shortest_path(self.__graph, target, source)
+        except nx.exception.NetworkXNoPath:
             return None
+        return list(zip(path, path[1:])) + [(source, target)]
 
     def has_cycle(self):
         try:
@@ -165,20 +170,18 @@ class CRE_Graph:
                 logger.warning(warn)
                 raise CycleDetectedError(warn)
 
-        self.__graph = self.__add_graph_edge(
-            doc_from=doc_from, link_to=link_to, graph=self.__graph
-        )
+        edge = self.__graph_edge(doc_from=doc_from, link_to=link_to)
+        if edge:
+            source, target, ltype = edge
+            self.__graph.add_edge(source, target, ltype=ltype)
 
-    def __add_graph_edge(
-        self,
-        doc_from: defs.Document,
-        link_to: defs.Link,
-        graph: nx.DiGraph,
-    ) -> nx.digraph:
+    def __graph_edge(
+        self, doc_from: defs.Document, link_to: defs.Link
+    ) -> Optional[Tuple[str, str, str]]:
         """
-        Adds a directed edge to the graph provided
-        called by both graph population and speculative cycle finding methods
-        hence why it accepts a graph and returns a graph
+        Returns the (source, target, ltype) of the edge a link adds to the graph
+        or None if it adds no edge,
+        called by both graph population and cycle finding methods
         """
         if doc_from.name == link_to.document.name:
             raise ValueError(
@@ -188,50 +191,26 @@ class CRE_Graph:
         if link_to.document.doctype != defs.Credoctypes.CRE.value:
             to_doctype = "Node"
 
+        graph_from = f"{doc_from.doctype.value}: {doc_from.id}"
+        graph_to = f"{to_doctype}: {link_to.document.id}"
         if doc_from.doctype == defs.Credoctypes.CRE:
             if link_to.ltype == defs.LinkTypes.Contains:
-                graph.add_edge(
-                    f"{doc_from.doctype.value}: {doc_from.id}",
-                    f"{to_doctype}: {link_to.document.id}",
-                    ltype=link_to.ltype.value,
-                )
+                return (graph_from, graph_to, link_to.ltype.value)
             elif link_to.ltype == defs.LinkTypes.PartOf:
-                graph.add_edge(
-                    f"{to_doctype}: {link_to.document.id}",
-                    f"{doc_from.doctype.value}: {doc_from.id}",
-                    ltype=defs.LinkTypes.Contains.value,
-                )
+                return (graph_to, graph_from, defs.LinkTypes.Contains.value)
             elif link_to.ltype == defs.LinkTypes.Related:
                 # do nothing if the opposite already exists in the graph, otherwise we introduce a cycle
-                if graph.has_edge(
-                    f"{to_doctype}: {link_to.document.id}",
-                    f"{doc_from.doctype.value}: {doc_from.id}",
-                ):
-                    return graph
-
-                graph.add_edge(
-                    f"{doc_from.doctype.value}: {doc_from.id}",
-                    f"{to_doctype}: {link_to.document.id}",
-                    ltype=defs.LinkTypes.Related.value,
-                )
+                if self.__graph.has_edge(graph_to, graph_from):
+                    return None
+                return (graph_from, graph_to, defs.LinkTypes.Related.value)
             elif (
                 link_to.ltype == defs.LinkTypes.LinkedTo
                 or link_to.ltype == defs.LinkTypes.AutomaticallyLinkedTo
             ):
-                graph.add_edge(
-                    f"{doc_from.doctype.value}: {doc_from.id}",
-                    f"{to_doctype}: {link_to.document.id}",
-                    ltype=link_to.ltype.value,
-                )
+                return (graph_from, graph_to, link_to.ltype.value)
             else:
                 raise ValueError(f"link type {link_to.ltype.value} not recognized")
-        else:
-            graph.add_edge(
-                f"{doc_from.doctype.value}: {doc_from.id}",
-                f"{to_doctype}: {link_to.document.id}",
-                ltype=link_to.ltype.value,
-            )
-        return graph
+        return (graph_from, graph_to, link_to.ltype.value)
 
     def __load_cre_graph(self, documents: List[defs.Document]):
         for doc in documents:
@@ -246,6 +246,14 @@ class ToolTypes(str, Enum, metaclass=EnumMetaWithContains):
         return None
 
 
+def _same_members(mine: List[Any], theirs: List[Any]) -> bool:
+    """order-insensitive comparison of two lists,
+    if either list is empty they are considered the same"""
+    if not mine or not theirs:
+        return True
+    return all(a in theirs for a in mine) and all(b in mine for b in theirs)
+
+
 @dataclass
 class Link:
     document: "Document"
@@ -260,7 +268,7 @@ class Link:
             self.ltype = LinkTypes.from_str(self.ltype)
 
     def __hash__(self) -> int:
-        return hash(json.dumps(self.todict()))
+        return hash((self.ltype.value, self.document))
 
     def __repr__(self) -> str:
         return json.dumps(self.todict())
@@ -308,33 +316,16 @@ class Document:
             and self.doctype.value == other.doctype.value
             and self.description == other.description
             and len(self.links) == len(other.links)
-            and all(
-                [
-                    a in other.links and b in self.links
-                    for a in self.links
-                    for b in other.links
-                ]
-            )
-            and all(
-                [
-                    a in other.tags and b in self.tags
-                    for a in self.tags
-                    for b in other.tags
-                ]
-            )
+            and _same_members(self.links, other.links)
+            and _same_members(self.tags, other.tags)
             and self.metadata == other.metadata
-            and all(
-                [
-                    a in other.embeddings and b in self.embeddings
-                    for a in self.embeddings
-                    for b in other.embeddings
-                ]
-            )
+            and _same_members(self.embeddings, other.embeddings)
             and self.embeddings_text == other.embeddings_text
         )
 
     def __hash__(self) -> int:
-        return hash(json.dumps(self.todict()))
+        # identity fields only, __eq__ ignores the order of links, tags and embeddings
+        return hash((self.doctype.value, self.id, self.name))
 
     def shallow_copy(self) -> Any:
         """Returns a copy of itself minus the Links,
@@ -443,6 +434,9 @@ class Node(Document):
             and self.hyperlink == other.hyperlink
         )
 
+    def __hash__(self) -> int:
+        return super().__hash__()
+
 
 @dataclass
 class Standard(Node):
@@ -478,7 +472,7 @@ class Standard(Node):
         return res
 
     def __hash__(self) -> int:
-        return hash(json.dumps(self.todict()))
+        return super().__hash__()
 
     def __eq__(self, other: object) -> bool:
         return (
@@ -520,7 +514,7 @@ class Tool(Standard):
         return res
 
     def __hash__(self) -> int:
-        return hash(json.dumps(self.todict()))
+        return super().__hash__()
 
 
 @dataclass(eq=False)
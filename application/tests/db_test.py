@@ -8,64 +8,186 @@ import unittest
 from unittest import mock
 from unittest.mock import patch
 import uuid
-from copy import copy, deepcopy
+from collections import Counter
+from copy import copy
 from pprint import pprint
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterator, List, Union
 from flask import json as flask_json
 
 import yaml
+from sqlalchemy import bindparam, event, select, tuple_
 from application.tests.utils.data_gen import export_format_data
 from application import create_app, sqla  # type: ignore
 from application.database import db
 from application.defs import cre_defs as defs
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # libyaml is not available
+    from yaml import SafeLoader as _SafeLoader  # type: ignore
 
-class TestDB(unittest.TestCase):
-    def tearDown(self) -> None:
+# built once so the compiled SQL is reused across lookups
+_CRE_BY_NAME = select(db.CRE).where(db.CRE.name == bindparam("name"))
+_NODE_BY_NAME = select(db.Node).where(db.Node.name == bindparam("name"))
+
+
+def _uuid_batch(size: int = 32) -> Iterator[str]:
+    # one urandom read for the whole batch instead of one per uuid4()
+    raw = os.urandom(16 * size)
+    return iter(
+        [
+            str(uuid.UUID(bytes=raw[i : i + 16], version=4))
+            for i in range(0, len(raw), 16)
+        ]
+    )
+
+
+def _bulk_insert(model: Any, rows: List[Dict[str, Any]]) -> None:
+    sqla.session.execute(model.__table__.insert(), rows)
+
+
+def _sqlite_on_connect(dbapi_connection, connection_record) -> None:
+    # pysqlite handles transactions itself and does not cooperate with SAVEPOINTs,
+    # let SQLAlchemy emit BEGIN instead
+    dbapi_connection.isolation_level = None
+
+    # test data is throwaway, don't pay for durability if TEST_DATABASE_URL is a file
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.close()
+
+
+def _sqlite_on_begin(connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+class _DBTestCase(unittest.TestCase):
+    """runs every test in a rolled back transaction against an empty schema"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = create_app(mode="test")
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        if sqla.engine.dialect.name == "sqlite":
+            event.listen(sqla.engine, "connect", _sqlite_on_connect)
+            event.listen(sqla.engine, "begin", _sqlite_on_begin)
+        sqla.create_all()
+        cls._uuid_pool = _uuid_batch()
+
+        # commit() in the code under test only releases a SAVEPOINT,
+        # the outer transaction is owned by the test
+        sqla.session.configure(join_transaction_mode="create_savepoint")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
         sqla.session.remove()
+        sqla.session.configure(join_transaction_mode="conditional_savepoint")
         sqla.drop_all()
-        self.app_context.pop()
+        if sqla.engine.dialect.name == "sqlite":
+            event.remove(sqla.engine, "connect", _sqlite_on_connect)
+            event.remove(sqla.engine, "begin", _sqlite_on_begin)
+        cls.app_context.pop()
+
+    def tearDown(self) -> None:
+        sqla.session.remove()
+        self.bind_patch.stop()
+        self.transaction.rollback()
+        self.connection.close()
+
+    def unique_name(self) -> str:
+        try:
+            return next(self._uuid_pool)
+        except StopIteration:
+            type(self)._uuid_pool = _uuid_batch()
+            return next(self._uuid_pool)
+
+    def assertSameDocuments(
+        self, want: List[defs.Document], got: List[defs.Document]
+    ) -> None:
+        # neither documents nor their links are returned in any particular order
+        self.assertEqual(len(want), len(got))
+        for w, g in zip(
+            sorted(want, key=lambda d: d.id), sorted(got, key=lambda d: d.id)
+        ):
+            w, g = w.todict(), g.todict()
+            self.assertCountEqual(w.pop("links", []), g.pop("links", []))
+            self.assertEqual(w, g)
 
     def setUp(self) -> None:
-        self.app = create_app(mode="test")
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        sqla.create_all()
+        # every test runs inside a transaction that is rolled back on tearDown
+        # instead of re-creating the schema
+        self.connection = sqla.engine.connect()
+        self.transaction = self.connection.begin()
+        self.bind_patch = patch.dict(sqla.engines, {None: self.connection})
+        self.bind_patch.start()
 
         self.collection = db.Node_collection().with_graph()
         self.collection.graph.with_graph(
             graph=nx.DiGraph(), graph_data=[]
         )  # initialize the graph singleton for the tests to be unique
 
+
+class TestDB(_DBTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
         collection = self.collection
 
-        dbcre = collection.add_cre(
-            defs.CRE(id="111-000", description="CREdesc", name="CREname")
-        )
-        self.dbcre = dbcre
-        dbgroup = collection.add_cre(
-            defs.CRE(id="111-001", description="Groupdesc", name="GroupName")
-        )
-        dbstandard = collection.add_node(
-            defs.Standard(
-                subsection="4.5.6",
-                section="FooStand",
-                name="BarStand",
-                hyperlink="https://example.com",
-                tags=["788-788", "b", "c"],
-            )
+        # fixture rows skip the ORM unit of work, only the linked rows are loaded back
+        _bulk_insert(
+            db.CRE,
+            [
+                {
+                    "external_id": "111-000",
+                    "description": "CREdesc",
+                    "name": "CREname",
+                    "tags": "",
+                },
+                {
+                    "external_id": "111-001",
+                    "description": "Groupdesc",
+                    "name": "GroupName",
+                    "tags": "",
+                },
+            ],
         )
-
-        collection.add_node(
-            defs.Standard(
-                subsection="4.5.6",
-                section="Unlinked",
-                name="Unlinked",
-                hyperlink="https://example.com",
-            )
+        _bulk_insert(
+            db.Node,
+            [
+                {
+                    "name": "BarStand",
+                    "section": "FooStand",
+                    "subsection": "4.5.6",
+                    "link": "https://example.com",
+                    "tags": "788-788,b,c",
+                    "description": "",
+                    "version": "",
+                    "section_id": "",
+                    "ntype": defs.Standard.__name__,
+                },
+                {
+                    "name": "Unlinked",
+                    "section": "Unlinked",
+                    "subsection": "4.5.6",
+                    "link": "https://example.com",
+                    "tags": "",
+                    "description": "",
+                    "version": "",
+                    "section_id": "",
+                    "ntype": defs.Standard.__name__,
+                },
+            ],
         )
+        dbcre, dbgroup = collection.session.scalars(
+            select(db.CRE).order_by(db.CRE.external_id)
+        ).all()
+        self.dbcre = dbcre
+        dbstandard = collection.session.scalars(
+            select(db.Node).where(db.Node.name == "BarStand")
+        ).one()
 
-        collection.session.add(dbcre)
         collection.add_link(cre=dbcre, node=dbstandard, ltype=defs.LinkTypes.LinkedTo)
         collection.add_internal_link(
             lower=dbcre, higher=dbgroup, ltype=defs.LinkTypes.Contains
@@ -109,21 +231,22 @@ class TestDB(unittest.TestCase):
         self.collection.session.commit()
 
         self.maxDiff = None
-        self.assertEqual(self.collection.get_by_tags(["dash-2"]), [cre])
-        self.assertEqual(self.collection.get_by_tags(["tag1", "underscore_3"]), [cre])
-        self.assertEqual(self.collection.get_by_tags(["space 6"]), [standard])
-        self.assertEqual(
-            self.collection.get_by_tags(["dots.5.5", "space 6"]), [standard]
-        )
-
-        self.assertCountEqual([cre, standard], self.collection.get_by_tags(["space"]))
-        self.assertCountEqual(
-            [cre, standard], self.collection.get_by_tags(["space", "tag1"])
-        )
-        self.assertCountEqual(self.collection.get_by_tags(["tag1"]), [cre, standard])
-
-        self.assertEqual(self.collection.get_by_tags([]), [])
-        self.assertEqual(self.collection.get_by_tags(["this should not be a tag"]), [])
+        cases = [
+            (["dash-2"], [cre]),
+            (["tag1", "underscore_3"], [cre]),
+            (["space 6"], [standard]),
+            (["dots.5.5", "space 6"], [standard]),
+            (["space"], [cre, standard]),
+            (["space", "tag1"], [cre, standard]),
+            (["tag1"], [cre, standard]),
+            (["tag1", "tag1", ""], [cre, standard]),
+            ([], []),
+            ([""], []),
+            (["this should not be a tag"], []),
+        ]
+        for tags, expected in cases:
+            with self.subTest(tags=tags):
+                self.assertCountEqual(self.collection.get_by_tags(tags), expected)
 
     def test_get_standards_names(self) -> None:
         result = self.collection.get_node_names()
@@ -135,25 +258,21 @@ class TestDB(unittest.TestCase):
 
         dbcrelo = db.CRE(name="internal connections test lo", description="ictlo")
         dbcrehi = db.CRE(name="internal connections test hi", description="icthi")
-        self.collection.session.add(dbcrelo)
-        self.collection.session.add(dbcrehi)
-        self.collection.session.commit()
-        for i in range(0, 100):
-            dbcre = db.CRE(name=str(i) + " name", description=str(i) + " desc")
-            self.collection.session.add(dbcre)
-            self.collection.session.commit()
-
-            # 1 low level cre to multiple groups
-            self.collection.session.add(
-                db.InternalLinks(group=dbcre.id, cre=dbcrelo.id)
-            )
-
-            # 1 hi level cre to multiple low level
-            self.collection.session.add(
-                db.InternalLinks(group=dbcrehi.id, cre=dbcre.id)
-            )
+        dbcres = [
+            db.CRE(name=str(i) + " name", description=str(i) + " desc")
+            for i in range(0, 100)
+        ]
+        self.collection.session.add_all([dbcrelo, dbcrehi, *dbcres])
+        self.collection.session.flush()  # populate the ids of the new cres
 
-            self.collection.session.commit()
+        # 1 low level cre to multiple groups
+        links = [db.InternalLinks(group=dbcre.id, cre=dbcrelo.id) for dbcre in dbcres]
+        # 1 hi level cre to multiple low level
+        links.extend(
+            [db.InternalLinks(group=dbcrehi.id, cre=dbcre.id) for dbcre in dbcres]
+        )
+        self.collection.session.bulk_save_objects(links)
+        self.collection.session.commit()
 
         result = self.collection.get_max_internal_connections()
         self.assertEqual(result, 100)
@@ -265,7 +384,7 @@ class TestDB(unittest.TestCase):
             + ".yaml"
         )
         with open(os.path.join(loc, groupname), "r") as f:
-            doc = yaml.safe_load(f)
+            doc = yaml.load(f, Loader=_SafeLoader)
             self.assertDictEqual(group, doc)
 
         crename = (
@@ -278,9 +397,46 @@ class TestDB(unittest.TestCase):
         )
         self.maxDiff = None
         with open(os.path.join(loc, crename), "r") as f:
-            doc = yaml.safe_load(f)
+            doc = yaml.load(f, Loader=_SafeLoader)
             self.assertCountEqual(cre, doc)
 
+    def test_export_json(self) -> None:
+        yaml_loc, json_loc = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.collection.export(yaml_loc)
+        self.collection.export(json_loc, format="json")
+
+        yamls = sorted(os.listdir(yaml_loc))
+        jsons = sorted(os.listdir(json_loc))
+        self.assertTrue(yamls)
+        self.assertEqual(
+            [os.path.splitext(f)[0] for f in yamls],
+            [os.path.splitext(f)[0] for f in jsons],
+        )
+        for yaml_file, json_file in zip(yamls, jsons):
+            self.assertTrue(json_file.endswith(".json"))
+            with open(os.path.join(yaml_loc, yaml_file)) as yf, open(
+                os.path.join(json_loc, json_file)
+            ) as jf:
+                self.assertEqual(yaml.load(yf, Loader=_SafeLoader), flask_json.load(jf))
+
+        with self.assertRaises(ValueError):
+            self.collection.export(json_loc, format="xml")
+
+    def test_get_standard_names(self):
+        for s in ["sa", "sb", "sc", "sd"]:
+            for sub in ["suba", "subb", "subc", "subd"]:
+                self.collection.add_node(
+                    defs.Standard(name=s, section=sub, subsection=sub)
+                )
+        self.assertCountEqual(
+            ["BarStand", "Unlinked", "sa", "sb", "sc", "sd"],
+            self.collection.standards(),
+        )
+
+
+class TestDBEmpty(_DBTestCase):
+    """tests that build all of their own data"""
+
     def test_StandardFromDB(self) -> None:
         expected = defs.Standard(
             name="foo",
@@ -320,8 +476,8 @@ class TestDB(unittest.TestCase):
         )
 
     def test_add_cre(self) -> None:
-        original_desc = str(uuid.uuid4())
-        name = str(uuid.uuid4())
+        original_desc = self.unique_name()
+        name = self.unique_name()
 
         c = defs.CRE(
             id="243-243",
@@ -330,14 +486,14 @@ class TestDB(unittest.TestCase):
             name=name,
         )
         self.assertIsNone(
-            self.collection.session.query(db.CRE).filter(db.CRE.name == c.name).first()
+            self.collection.session.execute(_CRE_BY_NAME, {"name": c.name}).scalar()
         )
 
         # happy path, add new cre
         newCRE = self.collection.add_cre(c)
-        dbcre = (
-            self.collection.session.query(db.CRE).filter(db.CRE.name == c.name).first()
-        )  # ensure transaction happened (commit() called)
+        dbcre = self.collection.session.execute(
+            _CRE_BY_NAME, {"name": c.name}
+        ).scalar()  # ensure transaction happened (commit() called)
         self.assertIsNotNone(dbcre.id)
         self.assertEqual(dbcre.name, c.name)
         self.assertEqual(dbcre.description, c.description)
@@ -349,17 +505,15 @@ class TestDB(unittest.TestCase):
         # ensure no accidental update (add only adds)
         c.description = "description2"
         newCRE = self.collection.add_cre(c)
-        dbcre = (
-            self.collection.session.query(db.CRE).filter(db.CRE.name == c.name).first()
-        )
+        dbcre = self.collection.session.execute(_CRE_BY_NAME, {"name": c.name}).scalar()
         # ensure original description
         self.assertEqual(dbcre.description, original_desc)
         # ensure original description
         self.assertEqual(newCRE.description, original_desc)
 
     def test_add_node(self) -> None:
-        original_section = str(uuid.uuid4())
-        name = str(uuid.uuid4())
+        original_section = self.unique_name()
+        name = self.unique_name()
 
         s = defs.Standard(
             doctype=defs.Credoctypes.Standard,
@@ -370,20 +524,16 @@ class TestDB(unittest.TestCase):
         )
 
         self.assertIsNone(
-            self.collection.session.query(db.Node)
-            .filter(db.Node.name == s.name)
-            .first()
+            self.collection.session.execute(_NODE_BY_NAME, {"name": s.name}).scalar()
         )
 
         # happy path, add new standard
         newStandard = self.collection.add_node(s)
         self.assertIsNotNone(newStandard)
 
-        dbstandard = (
-            self.collection.session.query(db.Node)
-            .filter(db.Node.name == s.name)
-            .first()
-        )  # ensure transaction happened (commit() called)
+        dbstandard = self.collection.session.execute(
+            _NODE_BY_NAME, {"name": s.name}
+        ).scalar()  # ensure transaction happened (commit() called)
         self.assertIsNotNone(dbstandard.id)
         self.assertEqual(dbstandard.name, s.name)
         self.assertEqual(dbstandard.section, s.section)
@@ -395,7 +545,70 @@ class TestDB(unittest.TestCase):
         self.assertEqual(dbstandard.tags, ",".join(s.tags))
         # standards match on all of name,section, subsection <-- if you change even one of them it's a new entry
 
-    def find_cres_of_cre(self) -> None:
+    def test_add_cres(self) -> None:
+        known = defs.CRE(
+            id="243-243", description=self.unique_name(), name=self.unique_name()
+        )
+        dbknown = self.collection.add_cre(known)
+        new = defs.CRE(
+            id="244-244", description=self.unique_name(), name=self.unique_name()
+        )
+
+        entries = self.collection.add_cres([known, new, new])
+
+        self.assertEqual(entries[0].id, dbknown.id)
+        self.assertIsNotNone(entries[1].id)
+        self.assertIs(entries[1], entries[2])
+        self.assertEqual(
+            self.collection.session.query(db.CRE)
+            .filter(db.CRE.name.in_([known.name, new.name]))
+            .count(),
+            2,
+        )
+
+    def test_add_cres_error_adds_nothing(self) -> None:
+        name = self.unique_name()
+        _bulk_insert(
+            db.CRE,
+            [{"id": name, "name": name, "description": name, "external_id": None}],
+        )
+        new = defs.CRE(
+            id="245-245", description=self.unique_name(), name=self.unique_name()
+        )
+
+        # the existing cre has no external id to register the empty one against
+        no_id = defs.CRE(id="246-246", name=name, description=name)
+        no_id.id = ""
+        with self.assertRaises(ValueError):
+            self.collection.add_cres([new, no_id])
+        self.assertFalse(self.collection.session.new)
+        self.assertIsNone(
+            self.collection.session.execute(_CRE_BY_NAME, {"name": new.name}).scalar()
+        )
+
+    def test_add_nodes(self) -> None:
+        name = self.unique_name()
+        known = defs.Standard(name=name, section="known", hyperlink="https://a.b/c")
+        dbknown = self.collection.add_node(known)
+        new = defs.Standard(name=name, section="new")
+        tool = defs.Tool(
+            name=self.unique_name(), tooltype=defs.ToolTypes.Defensive, section="s"
+        )
+
+        entries = self.collection.add_nodes([known, new, tool, new])
+
+        self.assertEqual(entries[0].id, dbknown.id)
+        self.assertIsNotNone(entries[1].id)
+        self.assertEqual(entries[2].ntype, defs.Credoctypes.Tool.value)
+        self.assertIs(entries[1], entries[3])
+        self.assertEqual(
+            self.collection.session.query(db.Node)
+            .filter(db.Node.name.in_([name, tool.name]))
+            .count(),
+            3,
+        )
+
+    def test_find_cres_of_cre(self) -> None:
         dbcre = db.CRE(description="CREdesc1", name="CREname1")
         groupless_cre = db.CRE(description="CREdesc2", name="CREname2")
         dbgroup = db.CRE(description="Groupdesc1", name="GroupName1")
@@ -403,11 +616,9 @@ class TestDB(unittest.TestCase):
 
         only_one_group = db.CRE(description="CREdesc3", name="CREname3")
 
-        self.collection.session.add(dbcre)
-        self.collection.session.add(groupless_cre)
-        self.collection.session.add(dbgroup)
-        self.collection.session.add(dbgroup2)
-        self.collection.session.add(only_one_group)
+        self.collection.session.add_all(
+            [dbcre, groupless_cre, dbgroup, dbgroup2, only_one_group]
+        )
         self.collection.session.commit()
 
         internalLink = db.InternalLinks(cre=dbcre.id, group=dbgroup.id, type="Contains")
@@ -417,9 +628,7 @@ class TestDB(unittest.TestCase):
         internalLink3 = db.InternalLinks(
             cre=only_one_group.id, group=dbgroup.id, type="Contains"
         )
-        self.collection.session.add(internalLink)
-        self.collection.session.add(internalLink2)
-        self.collection.session.add(internalLink3)
+        self.collection.session.add_all([internalLink, internalLink2, internalLink3])
         self.collection.session.commit()
 
         # happy path, find cre with 2 groups
@@ -428,7 +637,7 @@ class TestDB(unittest.TestCase):
         if not groups:
             self.fail("Expected exactly 2 cres")
         self.assertEqual(len(groups), 2)
-        self.assertEqual(groups, [dbgroup, dbgroup2])
+        self.assertCountEqual(groups, [dbgroup, dbgroup2])
 
         # find cre with 1 group
         group = self.collection.find_cres_of_cre(only_one_group)
@@ -442,6 +651,20 @@ class TestDB(unittest.TestCase):
         groups = self.collection.find_cres_of_cre(groupless_cre)
         self.assertIsNone(groups)
 
+        # another cre with the same name does not lend dbcre its groups
+        namesake = db.CRE(
+            description="CREdesc4", name=dbcre.name, external_id="999-999"
+        )
+        self.collection.session.add(namesake)
+        self.collection.session.commit()
+        self.collection.session.add(
+            db.InternalLinks(cre=namesake.id, group=groupless_cre.id, type="Contains")
+        )
+        self.collection.session.commit()
+        self.assertCountEqual(
+            self.collection.find_cres_of_cre(dbcre), [dbgroup, dbgroup2]
+        )
+
     def test_find_cres_of_standard(self) -> None:
         dbcre = db.CRE(description="CREdesc1", name="CREname1")
         dbgroup = db.CRE(description="CREdesc2", name="CREname2")
@@ -461,16 +684,18 @@ class TestDB(unittest.TestCase):
             ntype=defs.Standard.__name__,
         )
 
-        self.collection.session.add(dbcre)
-        self.collection.session.add(dbgroup)
-        self.collection.session.add(dbstandard1)
-        self.collection.session.add(group_standard)
-        self.collection.session.add(lone_standard)
+        self.collection.session.add_all(
+            [dbcre, dbgroup, dbstandard1, group_standard, lone_standard]
+        )
         self.collection.session.commit()
 
-        self.collection.session.add(db.Links(cre=dbcre.id, node=dbstandard1.id))
-        self.collection.session.add(db.Links(cre=dbgroup.id, node=dbstandard1.id))
-        self.collection.session.add(db.Links(cre=dbgroup.id, node=group_standard.id))
+        self.collection.session.add_all(
+            [
+                db.Links(cre=dbcre.id, node=dbstandard1.id),
+                db.Links(cre=dbgroup.id, node=dbstandard1.id),
+                db.Links(cre=dbgroup.id, node=group_standard.id),
+            ]
+        )
         self.collection.session.commit()
 
         # happy path, 1 group and 1 cre link to 1 standard
@@ -479,7 +704,7 @@ class TestDB(unittest.TestCase):
         if not cres:
             self.fail("Expected 2 cres")
         self.assertEqual(len(cres), 2)
-        self.assertEqual(cres, [dbcre, dbgroup])
+        self.assertCountEqual(cres, [dbcre, dbgroup])
 
         # group links to standard
         cres = self.collection.find_cres_of_node(group_standard)
@@ -533,39 +758,37 @@ class TestDB(unittest.TestCase):
             external_id="777-777", description="part of cre", name="poc"
         )
 
-        collection.session.add(dbc1)
-        collection.session.add(dbc2)
-        collection.session.add(dbc3)
-        collection.session.add(dbs1)
-        collection.session.add(dbs2)
-        collection.session.add(db_id_only)
-
-        collection.session.add(parent_cre)
-        collection.session.add(parent_cre2)
-        collection.session.add(partOf_cre)
-        collection.session.commit()
-
-        collection.session.add(
-            db.InternalLinks(type="Contains", group=dbc1.id, cre=dbc2.id)
-        )
-        collection.session.add(
-            db.InternalLinks(type="Contains", group=dbc1.id, cre=dbc3.id)
+        collection.session.add_all(
+            [
+                dbc1,
+                dbc2,
+                dbc3,
+                dbs1,
+                dbs2,
+                db_id_only,
+                parent_cre,
+                parent_cre2,
+                partOf_cre,
+            ]
         )
-        collection.session.add(db.Links(type="Linked To", cre=dbc1.id, node=dbs1.id))
+        collection.session.commit()
 
-        collection.session.add(
-            db.InternalLinks(
-                type=defs.LinkTypes.Contains.value,
-                group=parent_cre.id,
-                cre=partOf_cre.id,
-            )
-        )
-        collection.session.add(
-            db.InternalLinks(
-                type=defs.LinkTypes.Contains.value,
-                group=parent_cre2.id,
-                cre=partOf_cre.id,
-            )
+        collection.session.add_all(
+            [
+                db.InternalLinks(type="Contains", group=dbc1.id, cre=dbc2.id),
+                db.InternalLinks(type="Contains", group=dbc1.id, cre=dbc3.id),
+                db.Links(type="Linked To", cre=dbc1.id, node=dbs1.id),
+                db.InternalLinks(
+                    type=defs.LinkTypes.Contains.value,
+                    group=parent_cre.id,
+                    cre=partOf_cre.id,
+                ),
+                db.InternalLinks(
+                    type=defs.LinkTypes.Contains.value,
+                    group=parent_cre2.id,
+                    cre=partOf_cre.id,
+                ),
+            ]
         )
         collection.session.commit()
         self.maxDiff = None
@@ -617,27 +840,25 @@ class TestDB(unittest.TestCase):
             id="666-666", description="c_get_by_internal_id_only", name="cgbiio"
         )
 
+        gcS2_link = defs.Link(
+            ltype=defs.LinkTypes.LinkedTo,
+            document=defs.Standard(
+                name="gcS2",
+                section="gc1",
+                subsection="gc2",
+                hyperlink="gc3",
+                version="gc1.1.1",
+            ),
+        )
+        contains_links = [
+            defs.Link(ltype=defs.LinkTypes.Contains, document=copy(cd2)),
+            defs.Link(ltype=defs.LinkTypes.Contains, document=copy(cd3)),
+        ]
         expected = [
             copy(cd1)
-            .add_link(
-                defs.Link(
-                    ltype=defs.LinkTypes.LinkedTo,
-                    document=defs.Standard(
-                        name="gcS2",
-                        section="gc1",
-                        subsection="gc2",
-                        hyperlink="gc3",
-                        version="gc1.1.1",
-                    ),
-                )
-            )
-            .add_link(
-                defs.Link(
-                    ltype=defs.LinkTypes.Contains,
-                    document=copy(cd2),
-                )
-            )
-            .add_link(defs.Link(ltype=defs.LinkTypes.Contains, document=copy(cd3)))
+            .add_link(gcS2_link)
+            .add_link(contains_links[0])
+            .add_link(contains_links[1])
         ]
         self.maxDiff = None
         shallow_cd1 = copy(cd1)
@@ -666,10 +887,7 @@ class TestDB(unittest.TestCase):
         # getting "group cre 1" by partial name returns gcC1, gcC2 and gcC3
         res = collection.get_CREs(name="gcC%", partial=True)
         self.assertEqual(3, len(res))
-        self.assertCountEqual(
-            [expected[0].todict(), cd2.todict(), cd3.todict()],
-            [r.todict() for r in res],
-        )
+        self.assertSameDocuments([expected[0], cd2, cd3], res)
 
         # getting "group cre 1" by partial name and partial id returns gcC1
         res = collection.get_CREs(external_id="1%", name="gcC%", partial=True)
@@ -688,13 +906,7 @@ class TestDB(unittest.TestCase):
 
         # getting all the gcC* cres by partial name and partial description returns gcC1, gcC2, gcC3
         res = collection.get_CREs(description="gcC%", name="gcC%", partial=True)
-        want = [expected[0], cd2, cd3]
-        for el in res:
-            found = False
-            for wel in want:
-                if el.todict() == wel.todict():
-                    found = True
-            self.assertTrue(found)
+        self.assertSameDocuments([expected[0], cd2, cd3], res)
 
         self.assertEqual([], collection.get_CREs(external_id="123-123", name="gcC5"))
         self.assertEqual([], collection.get_CREs(external_id="1234"))
@@ -703,7 +915,14 @@ class TestDB(unittest.TestCase):
         # add a standard to gcC1
         collection.session.add(db.Links(type="Linked To", cre=dbc1.id, node=dbs2.id))
 
-        only_gcS2 = deepcopy(expected)  # save a copy of the current expected
+        only_gcS2 = [
+            defs.CRE(
+                id="123-123",
+                description="gcCD1",
+                name="gcC1",
+                links=[gcS2_link, *contains_links],
+            )
+        ]
         expected[0].add_link(
             defs.Link(
                 ltype=defs.LinkTypes.LinkedTo,
@@ -722,7 +941,7 @@ class TestDB(unittest.TestCase):
 
         #  we can retrieve ONLY the standard
         res = collection.get_CREs(name="gcC1", include_only=["gcS2"])
-        self.assertDictEqual(only_gcS2[0].todict(), res[0].todict())
+        self.assertSameDocuments(only_gcS2, res)
 
         ccd2 = copy(cd2)
         ccd2.links = []
@@ -764,14 +983,15 @@ class TestDB(unittest.TestCase):
             ),
         }
         links = [("dbc1", "dbs1"), ("dbc2", "dbs1"), ("dbc3", "dbs1")]
-        for k, v in docs.items():
-            collection.session.add(v)
+        collection.session.add_all(docs.values())
         collection.session.commit()
 
-        for cre, standard in links:
-            collection.session.add(
+        collection.session.add_all(
+            [
                 db.Links(type="Linked To", cre=docs[cre].id, node=docs[standard].id)
-            )
+                for cre, standard in links
+            ]
+        )
         collection.session.commit()
 
         expected = [
@@ -822,18 +1042,19 @@ class TestDB(unittest.TestCase):
             ),
         }
         links = [("dbc1", "dbs1"), ("dbc2", "dbs1"), ("dbc3", "dbs1")]
-        for k, v in docs.items():
-            collection.session.add(v)
+        collection.session.add_all(docs.values())
         collection.session.commit()
 
-        for cre, standard in links:
-            collection.session.add(
+        collection.session.add_all(
+            [
                 db.Links(
                     cre=docs[cre].id,
                     node=docs[standard].id,
                     type=defs.LinkTypes.LinkedTo,
                 )
-            )
+                for cre, standard in links
+            ]
+        )
         collection.session.commit()
 
         expected = [
@@ -914,47 +1135,35 @@ class TestDB(unittest.TestCase):
         self.collection.add_internal_link(
             higher=cres["dbca"], lower=cres["dbcb"], ltype=defs.LinkTypes.Related
         )
-
-        #   "happy path, internal link exists"
-        res = (
-            self.collection.session.query(db.InternalLinks)
-            .filter(
-                db.InternalLinks.group == cres["dbca"].id,
-                db.InternalLinks.cre == cres["dbcb"].id,
-            )
-            .first()
-        )
-        self.assertEqual((res.group, res.cre), (cres["dbca"].id, cres["dbcb"].id))
-
         # no cycle, free to insert
         self.collection.add_internal_link(
             higher=cres["dbcb"], lower=cres["dbcc"], ltype=defs.LinkTypes.Related
         )
-        res = (
-            self.collection.session.query(db.InternalLinks)
-            .filter(
-                db.InternalLinks.group == cres["dbcb"].id,
-                db.InternalLinks.cre == cres["dbcc"].id,
-            )
-            .first()
-        )
-        self.assertEqual((res.group, res.cre), (cres["dbcb"].id, cres["dbcc"].id))
-
         # introdcues a cycle, should not be inserted
         self.collection.add_internal_link(
             higher=cres["dbcc"], lower=cres["dbca"], ltype=defs.LinkTypes.Related
         )
 
-        # cycles are not inserted branch
-        none_res = (
-            self.collection.session.query(db.InternalLinks)
-            .filter(
-                db.InternalLinks.group == cres["dbcc"].id,
-                db.InternalLinks.cre == cres["dbca"].id,
+        # fetch all three candidate links in one query
+        rows = {
+            (res.group, res.cre)
+            for res in self.collection.session.query(db.InternalLinks).filter(
+                tuple_(db.InternalLinks.group, db.InternalLinks.cre).in_(
+                    [
+                        (cres["dbca"].id, cres["dbcb"].id),
+                        (cres["dbcb"].id, cres["dbcc"].id),
+                        (cres["dbcc"].id, cres["dbca"].id),
+                    ]
+                )
             )
-            .one_or_none()
-        )
-        self.assertIsNone(none_res)
+        }
+        self.assertEqual(
+            rows,
+            {
+                (cres["dbca"].id, cres["dbcb"].id),
+                (cres["dbcb"].id, cres["dbcc"].id),
+            },
+        )  # cycles are not inserted
 
     def test_text_search(self) -> None:
         """Given:
@@ -981,11 +1190,9 @@ class TestDB(unittest.TestCase):
         full_text_search('ipsum') returns cre:foo
         full_text_search('foo') returns [cre:foo,standard:Bar:blah:foo, standard:Bar:blah:foo1,standard:Bar:blah1:foo]
         """
-        collection = db.Node_collection()
         cre = defs.CRE(
             id="123-456", name="textSearchCRE", description="lorem ipsum tsSection+tsC"
         )
-        collection.add_cre(cre)
 
         s1 = defs.Standard(
             name="textSearchStandard",
@@ -993,21 +1200,18 @@ class TestDB(unittest.TestCase):
             subsection="tsSubSection",
             hyperlink="https://example.com/tsSection/tsSubSection",
         )
-        collection.add_node(s1)
         s2 = defs.Standard(
             name="textSearchStandard",
             section="tsSection",
             subsection="tsSubSection1",
             hyperlink="https://example.com/tsSection/tsSubSection1",
         )
-        collection.add_node(s2)
         s3 = defs.Standard(
             name="textSearchStandard",
             section="tsSection1",
             subsection="tsSubSection1",
             hyperlink="https://example.com/tsSection1/tsSubSection1",
         )
-        collection.add_node(s3)
         t1 = defs.Tool(
             name="textSearchTool",
             tooltype=defs.ToolTypes.Offensive,
@@ -1016,8 +1220,8 @@ class TestDB(unittest.TestCase):
             sectionID="15",
             section="rule 15",
         )
-        collection.add_node(t1)
-        collection.session.commit()
+        self.collection.add_cres([cre])
+        self.collection.add_nodes([s1, s2, s3, t1])
         expected: Dict[str, List[Any]] = {
             "123-456": [cre],
             "CRE:textSearchCRE": [cre],
@@ -1043,7 +1247,7 @@ class TestDB(unittest.TestCase):
         self.maxDiff = None
         for k, val in expected.items():
             res = self.collection.text_search(k)
-            self.assertCountEqual(res, val)
+            self.assertEqual(Counter(res), Counter(val))
 
     def test_dbNodeFromNode(self) -> None:
         data = {
@@ -1190,12 +1394,7 @@ class TestDB(unittest.TestCase):
         dbcres = []
         dbnodes = []
 
-        # clean the db from setup
-        sqla.session.remove()
-        sqla.drop_all()
-        sqla.create_all()
-
-        collection = db.Node_collection().with_graph()
+        collection = self.collection
 
         for i in range(0, 8):
             if i == 0 or i == 1:
@@ -1748,6 +1947,94 @@ class TestDB(unittest.TestCase):
             flask_json.dumps({"result": expected_response[2]["788-788"]}),
         )
 
+    def test_add_gap_analysis_results(self):
+        collection = db.Node_collection()
+        collection.add_gap_analysis_result(cache_key="a", ga_object="first a")
+        collection.add_gap_analysis_results({"a": "second a", "b": "b", "c": "c"})
+
+        # already cached results are not overwritten
+        self.assertEqual(collection.get_gap_analysis_result("a"), "first a")
+        self.assertEqual(collection.get_gap_analysis_result("b"), "b")
+        self.assertEqual(collection.get_gap_analysis_result("c"), "c")
+
+    def test_neo_db_gap_analysis(self):
+        def rel(rel_type, start, end):
+            seg = rel_type()
+            seg._start_node_element_id_property = start
+            seg._end_node_element_id_property = end
+            return seg
+
+        def path(nodes, relationships):
+            nodes = [mock.Mock(element_id=n) for n in nodes]
+            return mock.Mock(
+                start_node=nodes[0],
+                end_node=nodes[-1],
+                nodes=nodes,
+                relationships=relationships,
+            )
+
+        strong = path(
+            ["s1", "c1", "s2"],
+            [rel(db.LinkedToRel, "c1", "s1"), rel(db.LinkedToRel, "c1", "s2")],
+        )
+        weak = path(
+            ["s1", "c1", "c2", "s2"],
+            [
+                rel(db.LinkedToRel, "c1", "s1"),
+                rel(db.RelatedRel, "c1", "c2"),
+                rel(db.AutoLinkedToRel, "c2", "s2"),
+            ],
+        )
+
+        def step(start, end, relationship):
+            return {"start": start, "end": end, "relationship": relationship}
+
+        strong_result = {
+            "start": "s1",
+            "end": "s2",
+            "path": [step("c1", "s1", "LINKED_TO"), step("c1", "s2", "LINKED_TO")],
+        }
+        weak_result = {
+            "start": "s1",
+            "end": "s2",
+            "path": [
+                step("c1", "s1", "LINKED_TO"),
+                step("c1", "c2", "RELATED"),
+                step("c2", "s2", "AUTOMATICALLY_LINKED_TO"),
+            ],
+        }
+
+        nodes = mock.MagicMock()
+        nodes.filter.return_value = []
+        with patch.object(db.db, "cypher_query") as cypher_query, patch.object(
+            db.NeoStandard, "nodes", nodes
+        ), patch.object(
+            db.NEO_DB, "parse_node_no_links", side_effect=lambda n: n.element_id
+        ) as parse_node:
+            # UNION ALL does not keep the branches apart, the all-link query
+            # also returns the strong path again
+            cypher_query.return_value = (
+                [[weak, 1], [strong, 0], [strong, 1]],
+                None,
+            )
+
+            _, paths = db.NEO_DB.gap_analysis("s1", "s2")
+
+        # the same as formatting the strong then the all-link query results,
+        # each in the order it came back in and duplicates included
+        self.assertEqual(paths, [strong_result, weak_result, strong_result])
+        cypher_query.assert_called_once()
+        query = cypher_query.call_args[0][0]
+        self.assertLess(
+            query.index("LINKED_TO|AUTOMATICALLY_LINKED_TO|CONTAINS"),
+            query.index("UNION ALL"),
+        )
+        # every node is parsed once, however many paths it is on
+        self.assertCountEqual(
+            [c.args[0].element_id for c in parse_node.call_args_list],
+            ["s1", "s2", "c1", "c2"],
+        )
+
     def test_neo_db_parse_node_code(self):
         name = "name"
         description = "description"
@@ -2147,26 +2434,12 @@ class TestDB(unittest.TestCase):
         )
         self.assertEqual(tool_emb, {})
 
-    def test_get_standard_names(self):
-        for s in ["sa", "sb", "sc", "sd"]:
-            for sub in ["suba", "subb", "subc", "subd"]:
-                self.collection.add_node(
-                    defs.Standard(name=s, section=sub, subsection=sub)
-                )
-        self.assertCountEqual(
-            ["BarStand", "Unlinked", "sa", "sb", "sc", "sd"],
-            self.collection.standards(),
-        )
-
     def test_all_cres_with_pagination(self):
         """"""
         cres = []
         nodes = []
         dbcres = []
         dbnodes = []
-        sqla.session.remove()
-        sqla.drop_all()
-        sqla.create_all()
         collection = db.Node_collection()
         for i in range(0, 8):
             if i == 0 or i == 1:
@@ -2202,9 +2475,6 @@ class TestDB(unittest.TestCase):
         nodes = []
         dbcres = []
         dbnodes = []
-        sqla.session.remove()
-        sqla.drop_all()
-        sqla.create_all()
         collection = db.Node_collection()
         for i in range(0, 8):
             if i == 0 or i == 1:
@@ -2233,12 +2503,7 @@ class TestDB(unittest.TestCase):
         self.assertEqual(total_pages, 4)
 
     def test_get_cre_hierarchy(self) -> None:
-        # this needs a clean database and a clean graph so reinit everything
-        # sqla.session.remove()
-        # sqla.drop_all()
-        # sqla.create_all()
-        collection = self.collection  # db.Node_collection().with_graph()
-        # collection.graph.with_graph(graph=nx.DiGraph(), graph_data=[])
+        collection = self.collection
 
         _, inputDocs = export_format_data()
         importItems = []
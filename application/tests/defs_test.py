@@ -210,6 +210,24 @@ class TestCreDefs(unittest.TestCase):
         )
         self.assertNotEqual(s1_with_link, d1)
 
+        # links and tags are compared regardless of order
+        l1 = defs.Link(document=s2, ltype=defs.LinkTypes.LinkedTo)
+        l2 = defs.Link(document=defs.CRE(id="123-123", name="asdf"), ltype="Contains")
+        reordered = copy.deepcopy(d1).add_link(l1).add_link(l2)
+        reordered.tags = list(reversed(reordered.tags))
+        self.assertEqual(copy.deepcopy(d1).add_link(l2).add_link(l1), reordered)
+        duplicated = copy.deepcopy(d1)
+        duplicated.links = [l2, l2]
+        self.assertNotEqual(duplicated, reordered)  # same length, different members
+
+        # equal documents hash the same, whatever the order of their links
+        self.assertEqual(
+            hash(copy.deepcopy(d1).add_link(l2).add_link(l1)), hash(reordered)
+        )
+        self.assertEqual(
+            1, len({copy.deepcopy(d1).add_link(l2).add_link(l1), reordered})
+        )
+
     def test_standards_equality(self) -> None:
         s1 = defs.Standard(
             name="s1",
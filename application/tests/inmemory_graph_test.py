@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 import networkx as nx
 from application.defs import cre_defs as defs
 from application.database.inmemory_graph import CRE_Graph
@@ -154,3 +155,27 @@ class TestCreDefs(unittest.TestCase):
                 defs.Link(document=node1, ltype=defs.LinkTypes.AutomaticallyLinkedTo),
             )
         )
+
+    def test_existing_cycle(self) -> None:
+        cre1 = defs.CRE(name="c1", id="111-111")
+        cre2 = defs.CRE(name="c2", id="111-112")
+        cre3 = defs.CRE(name="c3", id="111-113")
+        graph = nx.DiGraph()
+        graph.add_edge("CRE: 111-111", "CRE: 111-112", ltype="Contains")
+        graph.add_edge("CRE: 111-112", "CRE: 111-111", ltype="Contains")
+
+        g = CRE_Graph()
+        g.with_graph(graph=graph, graph_data=[])
+
+        # a graph that already has a cycle refuses new links
+        with self.assertRaises(ValueError):
+            g.introduces_cycle(
+                cre1, defs.Link(document=cre3, ltype=defs.LinkTypes.Contains)
+            )
+        with self.assertRaises(ValueError):
+            g.add_link(cre2, defs.Link(document=cre3, ltype=defs.LinkTypes.Contains))
+
+        # the check runs once per loaded graph, not on every with_graph
+        with patch.object(CRE_Graph, "has_cycle") as has_cycle:
+            CRE_Graph().with_graph(graph=graph, graph_data=[])
+            has_cycle.assert_not_called()
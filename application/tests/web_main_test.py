@@ -13,6 +13,7 @@ import redis
 import rq
 import os
 import networkx as nx
+from typing import List
 
 from application import create_app, sqla  # type: ignore
 from application.tests.utils import data_gen
@@ -33,6 +34,10 @@ class MockJob:
 
 
 class TestMain(unittest.TestCase):
+    @staticmethod
+    def _md_entries(md: str) -> List[str]:
+        return re.sub(r"\s|</?pre>", "", md).split(",")
+
     def tearDown(self) -> None:
         sqla.session.remove()
         sqla.drop_all()
@@ -162,7 +167,11 @@ class TestMain(unittest.TestCase):
                 f"/rest/v1/id/{cres['cd'].id}?format=md",
                 headers={"Content-Type": "application/json"},
             )
-            self.assertEqual(re.sub("\s", "", md_response.data.decode()), md_expected)
+            # linked cres are not returned in any particular order
+            self.assertCountEqual(
+                self._md_entries(md_response.data.decode()),
+                self._md_entries(md_expected),
+            )
 
     def test_find_by_name(self) -> None:
         collection = db.Node_collection().with_graph()
@@ -213,7 +222,11 @@ class TestMain(unittest.TestCase):
                 f"/rest/v1/name/{cres['cd'].name}?format=md",
                 headers={"Content-Type": "application/json"},
             )
-            self.assertEqual(re.sub("\s", "", md_response.data.decode()), md_expected)
+            # linked cres are not returned in any particular order
+            self.assertCountEqual(
+                self._md_entries(md_response.data.decode()),
+                self._md_entries(md_expected),
+            )
 
             csv_expected = "CRE:name,CRE:id,CRE:description,Linked_CRE_0:id,Linked_CRE_0:name,Linked_CRE_0:link_type,Linked_CRE_1:id,Linked_CRE_1:name,Linked_CRE_1:link_type,Linked_CRE_2:id,Linked_CRE_2:name,Linked_CRE_2:link_typeCC,4,CC,2,CD,Contains,,,,,,"
             csv_response = client.get(f"/rest/v1/name/{cres['cc'].name}?format=csv")
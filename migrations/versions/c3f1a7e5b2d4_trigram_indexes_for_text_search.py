@@ -0,0 +1,51 @@
+"""trigram indexes for the node text search
+
+Revision ID: c3f1a7e5b2d4
+Revises: b8e4c2a1d9f3
+Create Date: 2026-10-15 14:02:17.583104
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c3f1a7e5b2d4"
+down_revision = "b8e4c2a1d9f3"
+branch_labels = None
+depends_on = None
+
+# text_search ORs a substring LIKE over all of these, postgres can only use
+# the indexes if every one of them is covered
+trigram_indexes = {
+    "ix_node_name_trgm": "lower(name)",
+    "ix_node_section_trgm": "lower(section)",
+    "ix_node_subsection_trgm": "lower(subsection)",
+    "ix_node_section_id_trgm": "lower(section_id)",
+    "ix_node_link_trgm": "link",
+    "ix_node_description_trgm": "description",
+}
+
+
+def upgrade():
+    # pg_trgm is postgres only, sqlite scans either way
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, expression in trigram_indexes.items():
+        op.create_index(
+            name,
+            "node",
+            [sa.text(f"{expression} gin_trgm_ops")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for name in trigram_indexes:
+        op.drop_index(name, table_name="node")
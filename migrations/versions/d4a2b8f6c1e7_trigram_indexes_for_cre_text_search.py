@@ -0,0 +1,47 @@
+"""trigram indexes for the cre text search
+
+Revision ID: d4a2b8f6c1e7
+Revises: c3f1a7e5b2d4
+Create Date: 2026-10-15 16:41:09.318452
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d4a2b8f6c1e7"
+down_revision = "c3f1a7e5b2d4"
+branch_labels = None
+depends_on = None
+
+# the cre half of text_search, these match the indexes declared on the CRE model
+trigram_indexes = {
+    "ix_cre_name_trgm": "lower(name)",
+    "ix_cre_external_id_trgm": "external_id",
+    "ix_cre_description_trgm": "lower(description)",
+}
+
+
+def upgrade():
+    # pg_trgm is postgres only, sqlite scans either way
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, expression in trigram_indexes.items():
+        op.create_index(
+            name,
+            "cre",
+            [sa.text(f"{expression} gin_trgm_ops")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for name in trigram_indexes:
+        op.drop_index(name, table_name="cre")